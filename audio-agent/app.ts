@@ -8,6 +8,7 @@ import { createDbPool } from "./src/db/db.connection.js";
 import { AudioPipeline } from "./src/pipeline/audio.pipeline.js";
 import { StubAudioPipeline } from "./src/pipeline/stub.pipeline.js";
 import { AsrService } from "./src/services/asr.service.js";
+import { AsrStream } from "./src/services/asr.stream.js";
 import { LlmService } from "./src/services/llm.service.js";
 import { TtsService } from "./src/services/tts.service.js";
 
@@ -66,7 +67,15 @@ export async function buildApp() {
   }
 
   await registerAudioRoutes(app, pipeline);
-  await registerAudioWebSocket(app, pipeline, env.AUDIO_SAMPLE_RATE);
+  let asrStreamUrl: string | undefined;
+  if (env.PIPELINE_MODE === "full" && env.ASR_STREAMING === "on") {
+    if (AsrStream.isSupported()) {
+      asrStreamUrl = AsrStream.url(env.ASR_WORKER_URL, env.AUDIO_SAMPLE_RATE);
+    } else {
+      app.log.warn("ASR_STREAMING=on needs a global WebSocket (Node 22+); using one-shot ASR");
+    }
+  }
+  await registerAudioWebSocket(app, pipeline, env.AUDIO_SAMPLE_RATE, asrStreamUrl);
 
   app.get("/healthz", async () => ({ ok: true }));
 
@@ -1,14 +1,15 @@
 """Minimal mic streaming client.
 
 - Captures PCM16LE mono at 16kHz
-- Sends binary frames over WS to /v1/audio/stream
-- Ends stream and prints transcript + response
+- Sends binary frames over WS, e.g. to the ASR worker's /v1/asr/stream
+- Prints partial/final transcripts as they arrive (or a "result" message),
+  then ends the stream and waits for the last final
 
 Requirements (client env):
 - pip install sounddevice numpy websocket-client
 
 Usage:
-- python mic_client.py ws://localhost:8089/v1/audio/stream
+- python mic_client.py "ws://localhost:8091/v1/asr/stream?sample_rate=16000"
 """
 
 from __future__ import annotations
@@ -16,7 +17,6 @@ from __future__ import annotations
 import json
 import sys
 import threading
-import time
 
 import numpy as np
 import sounddevice as sd
@@ -25,28 +25,56 @@ from websocket import WebSocketApp
 SAMPLE_RATE = 16000
 CHANNELS = 1
 FRAME_MS = 50
+# Frames are coalesced into one WS message per BATCH_MS to amortize per-send overhead.
+BATCH_MS = 200
+# The gateway allows up to 180 s for TTS, so wait at least that long for a result.
+RESULT_TIMEOUT_S = 180.0
+CLOSE_TIMEOUT_S = 5.0
 
 
 def main(ws_url: str):
     frame_samples = int(SAMPLE_RATE * (FRAME_MS / 1000))
+    batch_samples = max(frame_samples, int(SAMPLE_RATE * (BATCH_MS / 1000)))
 
     stop_event = threading.Event()
+    capture_threads: list[threading.Thread] = []
 
     def on_open(ws):
         ws.send(json.dumps({"type": "start"}))
 
         def _capture():
+            # Reused for the whole session; ws.send copies the payload while
+            # masking, so one tobytes() per batch is the only per-send allocation.
+            batch = np.empty((batch_samples + frame_samples, CHANNELS), dtype=np.int16)
+            filled = 0
             with sd.InputStream(samplerate=SAMPLE_RATE, channels=CHANNELS, dtype="int16") as stream:
                 while not stop_event.is_set():
                     audio, _ = stream.read(frame_samples)
-                    ws.send(audio.tobytes(), opcode=2)
-
-        threading.Thread(target=_capture, daemon=True).start()
+                    n = len(audio)
+                    batch[filled:filled + n] = audio
+                    filled += n
+                    if filled >= batch_samples:
+                        ws.send(batch[:filled].tobytes(), opcode=2)
+                        filled = 0
+            if filled:
+                ws.send(batch[:filled].tobytes(), opcode=2)
+
+        capture = threading.Thread(target=_capture, daemon=True)
+        capture_threads.append(capture)
+        capture.start()
 
     def on_message(ws, message):
         try:
             msg = json.loads(message)
-            if msg.get("type") == "result":
+            kind = msg.get("type")
+            if kind == "partial":
+                print("\r... " + msg.get("text", ""), end="", flush=True)
+            elif kind == "final":
+                print("\r>>> " + msg.get("text", ""), flush=True)
+            elif kind == "end":
+                stop_event.set()
+                ws.close()
+            elif kind == "result":
                 print("\n=== Transcript ===\n", msg.get("transcript_text"))
                 print("\n=== Response ===\n", msg.get("response_text"))
                 stop_event.set()
@@ -68,15 +96,30 @@ def main(ws_url: str):
     t = threading.Thread(target=ws.run_forever, daemon=True)
     t.start()
 
-    input()
+    try:
+        input()
+    except (KeyboardInterrupt, EOFError):
+        stop_event.set()
+        ws.close()
+        t.join(timeout=CLOSE_TIMEOUT_S)
+        return
+
+    # Stop capture and let it flush any partial batch before ending the stream.
+    stop_event.set()
+    for capture in capture_threads:
+        capture.join()
     ws.send(json.dumps({"type": "end"}))
 
-    while t.is_alive():
-        time.sleep(0.1)
+    try:
+        t.join(timeout=RESULT_TIMEOUT_S)
+    except KeyboardInterrupt:
+        pass
+    if t.is_alive():
+        ws.close()
 
 
 if __name__ == "__main__":
     if len(sys.argv) != 2:
-        print("Usage: python mic_client.py ws://localhost:8089/v1/audio/stream")
+        print('Usage: python mic_client.py "ws://localhost:8091/v1/asr/stream?sample_rate=16000"')
         raise SystemExit(2)
     main(sys.argv[1])
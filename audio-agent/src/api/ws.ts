@@ -1,5 +1,6 @@
 import type { FastifyInstance } from "fastify";
 import type { AudioPipelineLike } from "../pipeline/audio.pipeline.js";
+import { AsrStream } from "../services/asr.stream.js";
 import { pcm16ToWavBuffer } from "../utils/audio.utils.js";
 
 type ClientMessage = {
@@ -50,16 +51,44 @@ function tryParseJsonMessage(data: Buffer): ClientMessage | null {
   }
 }
 
-export async function registerAudioWebSocket(app: FastifyInstance, pipeline: AudioPipelineLike, sampleRate: number) {
+/**
+ * With asrStreamUrl set, user audio is also streamed to the ASR worker as it arrives:
+ * the client gets server.user.transcript.partial events mid-turn and turnComplete only
+ * waits for the last utterance. Without it, or if the stream fails, the buffered turn
+ * is transcribed in one shot. A streamed transcript is used as is, so speech the worker's
+ * VAD dropped is not re-checked against the buffered audio.
+ */
+export async function registerAudioWebSocket(
+  app: FastifyInstance,
+  pipeline: AudioPipelineLike,
+  sampleRate: number,
+  asrStreamUrl?: string
+) {
   app.get("/v1/audio/stream", { websocket: true }, (connection) => {
     const ws = (connection as { socket?: { on: Function } }).socket ?? (connection as unknown as { on: Function; send: Function });
     let sessionId: string | undefined;
     let chunks: Buffer[] = [];
     let seq = 0;
     let inFlight = false;
+    let asrStream: AsrStream | null = null;
 
     const nextSeq = () => ++seq;
 
+    const pushPcm = (pcm: Buffer) => {
+      chunks.push(pcm);
+      if (!asrStreamUrl) return;
+      asrStream ??= new AsrStream(asrStreamUrl, (text) =>
+        sendEvent(connection, "server.user.transcript.partial", { text }, nextSeq())
+      );
+      asrStream.send(pcm);
+    };
+
+    const finishAsrStream = async (): Promise<string> => {
+      const stream = asrStream;
+      asrStream = null;
+      return ((await stream?.finish()) ?? "").trim();
+    };
+
     const emitReady = () =>
       sendEvent(connection, "server.session.state", { state: "ready" }, nextSeq());
 
@@ -100,7 +129,7 @@ export async function registerAudioWebSocket(app: FastifyInstance, pipeline: Aud
       if (type === "client.audio.chunk" || type === "client.audio.chunk.base64") {
         const b64 = payload["data"] as string | undefined;
         if (b64) {
-          chunks.push(Buffer.from(b64, "base64"));
+          pushPcm(Buffer.from(b64, "base64"));
         }
         return true;
       }
@@ -118,18 +147,22 @@ export async function registerAudioWebSocket(app: FastifyInstance, pipeline: Aud
 
         const pcm = Buffer.concat(chunks);
         chunks = [];
+        // Empty means no stream, a failed stream, or nothing heard: use one-shot ASR.
+        const streamedText = await finishAsrStream();
         const wav = pcm16ToWavBuffer(pcm, sampleRate);
         if (transcribeOnly) {
-          const asr = await pipeline.transcribeOnly(wav, sessionId);
-          if (asr.transcript_text) {
-            sendEvent(connection, "server.user.transcript.final", { text: asr.transcript_text }, nextSeq());
+          const transcript = streamedText || (await pipeline.transcribeOnly(wav, sessionId)).transcript_text;
+          if (transcript) {
+            sendEvent(connection, "server.user.transcript.final", { text: transcript }, nextSeq());
           }
           emitReady();
           inFlight = false;
           return true;
         }
 
-        const result = await pipeline.handleTurn(wav, sessionId);
+        const result = streamedText
+          ? await pipeline.handleTextTurn(streamedText, sessionId)
+          : await pipeline.handleTurn(wav, sessionId);
 
         if (result.transcript_text) {
           sendEvent(connection, "server.user.transcript.final", { text: result.transcript_text }, nextSeq());
@@ -178,6 +211,8 @@ export async function registerAudioWebSocket(app: FastifyInstance, pipeline: Aud
 
       if (type === "client.session.stop") {
         chunks = [];
+        asrStream?.close();
+        asrStream = null;
         emitReady();
         return true;
       }
@@ -208,7 +243,7 @@ export async function registerAudioWebSocket(app: FastifyInstance, pipeline: Aud
           }
 
           // Treat as raw PCM chunk
-          chunks.push(data);
+          pushPcm(data);
           return;
         }
         if (data instanceof ArrayBuffer) {
@@ -221,7 +256,7 @@ export async function registerAudioWebSocket(app: FastifyInstance, pipeline: Aud
             }
             return;
           }
-          chunks.push(buf);
+          pushPcm(buf);
           return;
         }
         if (data instanceof Uint8Array) {
@@ -234,7 +269,7 @@ export async function registerAudioWebSocket(app: FastifyInstance, pipeline: Aud
             }
             return;
           }
-          chunks.push(buf);
+          pushPcm(buf);
           return;
         }
 
@@ -243,5 +278,10 @@ export async function registerAudioWebSocket(app: FastifyInstance, pipeline: Aud
         emitError(err?.message ?? "WS error");
       }
     });
+
+    ws.on("close", () => {
+      asrStream?.close();
+      asrStream = null;
+    });
   });
 }
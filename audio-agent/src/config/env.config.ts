@@ -42,6 +42,11 @@ const EnvSchema = z.object({
   ASR_WORKER_URL: z.string().optional().default(""),
   TTS_WORKER_URL: z.string().optional().default(""),
 
+  // Opt-in: stream mic audio to the ASR worker's /v1/asr/stream during a turn (needs a global
+  // WebSocket). Partials re-transcribe the open utterance and share the worker's batch queue,
+  // so only enable it on a GPU worker; frames below ASR_STREAM_VAD_RMS are not transcribed.
+  ASR_STREAMING: z.enum(["on", "off"]).default("off"),
+
   // If TTS worker is unavailable (e.g., local Python env missing), optionally return silent WAV.
   TTS_FALLBACK: z.enum(["fail", "silent"]).default("fail"),
 
@@ -0,0 +1,99 @@
+type StreamMessage = {
+  type: string;
+  text?: string;
+};
+
+// After {"type":"end"} the worker transcribes the open utterance; don't wait forever for it.
+const END_TIMEOUT_MS = 15000;
+
+/**
+ * One utterance stream to the ASR worker's /v1/asr/stream WebSocket.
+ *
+ * PCM16 frames are forwarded as they arrive so the worker transcribes while the
+ * user is still speaking; finish() then only waits for the last utterance.
+ * Uses the global WebSocket (Node 22+, or Node 20 with --experimental-websocket).
+ */
+export class AsrStream {
+  private readonly socket: WebSocket;
+  private readonly pending: (Buffer | string)[] = [];
+  private readonly finals: string[] = [];
+  private readonly ended: Promise<string | null>;
+
+  static isSupported(): boolean {
+    return typeof WebSocket !== "undefined";
+  }
+
+  static url(baseUrl: string, sampleRate: number): string {
+    return `${baseUrl.replace(/^http/, "ws")}/v1/asr/stream?sample_rate=${sampleRate}`;
+  }
+
+  constructor(url: string, onText: (text: string) => void) {
+    this.socket = new WebSocket(url);
+    let resolveEnded: (text: string | null) => void = () => {};
+    this.ended = new Promise((resolve) => {
+      resolveEnded = resolve;
+    });
+
+    this.socket.addEventListener("open", () => {
+      for (const frame of this.pending) this.socket.send(frame);
+      this.pending.length = 0;
+    });
+    this.socket.addEventListener("message", (event) => {
+      let msg: StreamMessage;
+      try {
+        msg = JSON.parse(String(event.data)) as StreamMessage;
+      } catch {
+        return;
+      }
+      const text = (msg.text ?? "").trim();
+      if (msg.type === "partial") {
+        onText(this.text(text));
+      } else if (msg.type === "final") {
+        if (text) this.finals.push(text);
+        onText(this.text());
+      } else if (msg.type === "end") {
+        resolveEnded(this.text());
+      }
+    });
+    // Resolving twice is a no-op, so these only matter if "end" never arrived.
+    this.socket.addEventListener("error", () => resolveEnded(null));
+    this.socket.addEventListener("close", () => resolveEnded(null));
+  }
+
+  send(pcm: Buffer) {
+    this.write(pcm);
+  }
+
+  /** Ends the stream; resolves to the full transcript, or null if the stream failed. */
+  async finish(): Promise<string | null> {
+    this.write(JSON.stringify({ type: "end" }));
+    let timer: NodeJS.Timeout | undefined;
+    const timeout = new Promise<null>((resolve) => {
+      timer = setTimeout(() => resolve(null), END_TIMEOUT_MS);
+    });
+    try {
+      return await Promise.race([this.ended, timeout]);
+    } finally {
+      clearTimeout(timer);
+      this.close();
+    }
+  }
+
+  close() {
+    if (this.socket.readyState === WebSocket.CONNECTING || this.socket.readyState === WebSocket.OPEN) {
+      this.socket.close();
+    }
+  }
+
+  private write(data: Buffer | string) {
+    if (this.socket.readyState === WebSocket.CONNECTING) {
+      this.pending.push(data);
+    } else if (this.socket.readyState === WebSocket.OPEN) {
+      this.socket.send(data);
+    }
+  }
+
+  private text(partial = ""): string {
+    return [...this.finals, partial].filter(Boolean).join(" ");
+  }
+}
@@ -1,4 +1,3 @@
-import { extractPcmFromWav } from "../utils/audio.utils.js";
 import { serviceUnavailable } from "../utils/errors.js";
 
 export type TtsResult = {
@@ -7,18 +6,11 @@ export type TtsResult = {
   channels: number;
 };
 
-type RawTtsResponse = {
-  audio_pcm_b64?: string;
-  audio_wav_b64?: string;
-  sample_rate?: number;
-  channels?: number;
-};
-
 /**
  * TTS Service - PCM16, 24kHz, Mono output from worker
  *
- * The worker returns raw PCM16LE base64 and resamples to 24kHz.
- * This service validates and reports metrics only.
+ * The worker returns raw PCM16LE bytes (resampled to 24kHz) with the format in
+ * X-Sample-Rate / X-Channels headers. This service validates and reports metrics only.
  */
 export class TtsService {
   constructor(private readonly baseUrl: string) {}
@@ -33,7 +25,7 @@ export class TtsService {
       
       // TTS worker already handles format conversion (22050Hz → 24000Hz resampling)
       // and quality parameters are set in service.py
-      const res = await fetch(`${this.baseUrl}/v1/tts`, {
+      const res = await fetch(`${this.baseUrl}/v1/tts/pcm`, {
         method: "POST",
         headers: { "content-type": "application/json" },
         body: JSON.stringify({ text }),
@@ -45,25 +37,17 @@ export class TtsService {
         throw serviceUnavailable("TTS worker failed", { status: res.status, body });
       }
 
-      const result = (await res.json()) as RawTtsResponse;
-      
-      let audioPcmB64 = result.audio_pcm_b64;
-      if (!audioPcmB64 && result.audio_wav_b64) {
-        const wavBuffer = Buffer.from(result.audio_wav_b64, "base64");
-        const pcmBuffer = extractPcmFromWav(wavBuffer);
-        audioPcmB64 = pcmBuffer.toString("base64");
-      }
+      const audioBytes = Buffer.from(await res.arrayBuffer());
 
       // Validate output format
-      if (!audioPcmB64) {
+      if (audioBytes.length === 0) {
         throw serviceUnavailable("TTS worker returned empty audio", {});
       }
-      
-      // Decode base64 to get actual byte count
-      const audioBytes = Buffer.from(audioPcmB64, "base64");
+
+      const audioPcmB64 = audioBytes.toString("base64");
       const pcmBytes = audioBytes.length;
-      const sampleRate = result.sample_rate || 24000;
-      const channels = result.channels || 1;
+      const sampleRate = Number(res.headers.get("x-sample-rate")) || 24000;
+      const channels = Number(res.headers.get("x-channels")) || 1;
       const sampleCount = pcmBytes / 2; // 2 bytes per sample (16-bit)
       const durationSec = sampleCount / sampleRate;
       
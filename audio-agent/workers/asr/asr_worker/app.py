@@ -1,12 +1,14 @@
 from __future__ import annotations
 
 import asyncio
+import json
 import os
 
-from fastapi import FastAPI
+import numpy as np
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
 
-from .service import AsrConfig, AsrService
+from .service import AsrConfig, AsrService, UtteranceBuffer
 
 
 class AsrRequest(BaseModel):
@@ -27,9 +29,80 @@ def _device_from_env() -> str | int:
     return v
 
 
+# Concurrent requests are collected for up to ASR_MAX_WAIT_MS and run through
+# the pipeline together, at most ASR_MAX_BATCH at a time.
+ASR_MAX_BATCH = max(1, int(os.getenv("ASR_MAX_BATCH", "8")))
+ASR_MAX_WAIT_MS = int(os.getenv("ASR_MAX_WAIT_MS", "20"))
+
+# ASR_BACKEND=faster-whisper swaps the HF pipeline for CTranslate2 with int8
+# weights; model ids then use faster-whisper names such as "large-v3".
+_BACKEND = os.getenv("ASR_BACKEND", "transformers")
+_DEFAULT_MODEL_ID = (
+    "large-v3" if _BACKEND == "faster-whisper" else "openai/whisper-large-v3")
+
+# /v1/asr/stream: re-transcribe the open utterance every ASR_STREAM_PARTIAL_MS of
+# new audio, and finalize it after ASR_STREAM_SILENCE_MS below ASR_STREAM_VAD_RMS
+# or once it is ASR_STREAM_MAX_UTTERANCE_MS long (Whisper's window is 30 s).
+ASR_STREAM_PARTIAL_MS = int(os.getenv("ASR_STREAM_PARTIAL_MS", "500"))
+ASR_STREAM_SILENCE_MS = int(os.getenv("ASR_STREAM_SILENCE_MS", "700"))
+ASR_STREAM_VAD_RMS = float(os.getenv("ASR_STREAM_VAD_RMS", "0.01"))
+ASR_STREAM_MAX_UTTERANCE_MS = int(os.getenv("ASR_STREAM_MAX_UTTERANCE_MS", "30000"))
+
 app = FastAPI(title="ASR Worker", version="0.1.0")
-_service = AsrService(AsrConfig(model_id=os.getenv(
-    "ASR_MODEL_ID", "openai/whisper-large-v3"), device=_device_from_env()))
+_service = AsrService(AsrConfig(
+    model_id=os.getenv("ASR_MODEL_ID", _DEFAULT_MODEL_ID),
+    device=_device_from_env(),
+    torch_dtype=os.getenv("ASR_TORCH_DTYPE") or None,
+    backend=_BACKEND,
+    compute_type=os.getenv("ASR_COMPUTE_TYPE") or None,
+    language=os.getenv("ASR_LANGUAGE") or None,
+    warmup=os.getenv("ASR_WARMUP", "1") != "0",
+))
+
+_BatchItem = tuple[np.ndarray, int, asyncio.Future]
+_queue: asyncio.Queue[_BatchItem] | None = None
+_batcher_task: asyncio.Task | None = None
+
+
+async def _collect_batch(queue: asyncio.Queue[_BatchItem]) -> list[_BatchItem]:
+    loop = asyncio.get_running_loop()
+    batch = [await queue.get()]
+    deadline = loop.time() + ASR_MAX_WAIT_MS / 1000
+    while len(batch) < ASR_MAX_BATCH:
+        timeout = deadline - loop.time()
+        if timeout <= 0:
+            break
+        try:
+            batch.append(await asyncio.wait_for(queue.get(), timeout))
+        except asyncio.TimeoutError:
+            break
+    return batch
+
+
+async def _run_batcher(queue: asyncio.Queue[_BatchItem]) -> None:
+    while True:
+        batch = [item for item in await _collect_batch(queue)
+                 if not item[2].done()]
+        if not batch:
+            continue
+        try:
+            transcripts = await asyncio.to_thread(
+                _service.transcribe_batch, [(audio, sr) for audio, sr, _ in batch])
+        except Exception as exc:
+            for _, _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(exc)
+            continue
+        for (_, _, fut), transcript in zip(batch, transcripts):
+            if not fut.done():
+                fut.set_result(transcript)
+
+
+@app.on_event("startup")
+async def _start_batcher():
+    global _queue, _batcher_task
+    _queue = asyncio.Queue()
+    _batcher_task = asyncio.create_task(_run_batcher(_queue))
 
 
 @app.get("/healthz")
@@ -37,7 +110,87 @@ async def healthz():
     return {"ok": True}
 
 
+async def _transcribe(audio: np.ndarray, sr: int) -> str:
+    fut: asyncio.Future[str] = asyncio.get_running_loop().create_future()
+    await _queue.put((audio, sr, fut))
+    return await fut
+
+
 @app.post("/v1/asr", response_model=AsrResponse)
 async def asr(req: AsrRequest):
-    transcript = await asyncio.to_thread(_service.transcribe_wav_b64, req.audio_b64)
-    return AsrResponse(transcript=transcript)
+    audio, sr = await asyncio.to_thread(_service.decode_wav_b64, req.audio_b64)
+    return AsrResponse(transcript=await _transcribe(audio, sr))
+
+
+@app.post("/v1/asr/raw", response_model=AsrResponse)
+async def asr_raw(request: Request):
+    """Same as /v1/asr but takes the WAV file as the raw request body."""
+    wav_bytes = await request.body()
+    if not wav_bytes:
+        raise HTTPException(status_code=400, detail="audio body must not be empty")
+    audio, sr = await asyncio.to_thread(_service.decode_wav, wav_bytes)
+    return AsrResponse(transcript=await _transcribe(audio, sr))
+
+
+@app.websocket("/v1/asr/stream")
+async def asr_stream(ws: WebSocket):
+    """Incremental ASR over binary PCM16LE mono frames.
+
+    Emits {"type": "partial"} while an utterance is open and {"type": "final"}
+    when it ends on silence, reaches ASR_STREAM_MAX_UTTERANCE_MS, or the client
+    sends {"type": "end"}. Long speech therefore arrives as several finals.
+    """
+    raw_rate = ws.query_params.get("sample_rate", "16000")
+    sample_rate = int(raw_rate) if raw_rate.isdigit() else 0
+    await ws.accept()
+    if sample_rate <= 0:
+        await ws.close(code=1008, reason="sample_rate must be a positive integer")
+        return
+    buf = UtteranceBuffer(sample_rate, ASR_STREAM_SILENCE_MS, ASR_STREAM_VAD_RMS,
+                          ASR_STREAM_MAX_UTTERANCE_MS)
+    partial_every = int(sample_rate * ASR_STREAM_PARTIAL_MS / 1000)
+    partial_at = 0
+    partial_task: asyncio.Task | None = None
+
+    async def _emit_partial(audio: np.ndarray) -> None:
+        text = await _transcribe(audio, sample_rate)
+        await ws.send_json({"type": "partial", "text": text})
+
+    async def _finalize() -> None:
+        nonlocal partial_at
+        if partial_task is not None:
+            partial_task.cancel()
+        if buf.has_speech:
+            text = await _transcribe(buf.audio(), sample_rate)
+            await ws.send_json({"type": "final", "text": text})
+        buf.reset()
+        partial_at = 0
+
+    try:
+        while True:
+            msg = await ws.receive()
+            if msg["type"] == "websocket.disconnect":
+                break
+            if msg.get("bytes") is not None:
+                if buf.append(msg["bytes"]):
+                    await _finalize()
+                elif (buf.has_speech
+                      and buf.num_samples - partial_at >= partial_every
+                      and (partial_task is None or partial_task.done())):
+                    partial_at = buf.num_samples
+                    partial_task = asyncio.create_task(_emit_partial(buf.audio()))
+            elif msg.get("text") is not None:
+                try:
+                    control = json.loads(msg["text"])
+                except ValueError:
+                    continue
+                if control.get("type") == "end":
+                    await _finalize()
+                    await ws.send_json({"type": "end"})
+                    await ws.close()
+                    break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if partial_task is not None:
+            partial_task.cancel()
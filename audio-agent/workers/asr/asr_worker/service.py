@@ -1,46 +1,248 @@
 from __future__ import annotations
 
-import base64
 import io
+import struct
 from dataclasses import dataclass
+from math import gcd
 
 import numpy as np
+import pybase64
 import soundfile as sf
+import torch
+from scipy import signal as scipy_signal
 from transformers import pipeline
 
+_TORCH_DTYPES = {
+    "fp16": torch.float16,
+    "float16": torch.float16,
+    "bf16": torch.bfloat16,
+    "bfloat16": torch.bfloat16,
+    "fp32": torch.float32,
+    "float32": torch.float32,
+}
+
+
+def _torch_dtype(name: str) -> torch.dtype:
+    try:
+        return _TORCH_DTYPES[name.strip().lower()]
+    except KeyError:
+        raise ValueError(
+            f"Unknown ASR torch dtype {name!r}; "
+            f"expected one of {', '.join(_TORCH_DTYPES)}") from None
+
+
+def _read_pcm16_wav(buf: bytes) -> tuple[np.ndarray, int] | None:
+    """Decode a PCM16 WAV by viewing its data chunk, skipping libsndfile.
+
+    Returns float32 samples shaped like ``sf.read`` output, or None when the
+    buffer is not plain PCM16 so callers can fall back to soundfile.
+    """
+    if len(buf) < 12 or buf[0:4] != b"RIFF" or buf[8:12] != b"WAVE":
+        return None
+
+    fmt: tuple[int, int, int, int] | None = None
+    pos = 12
+    while pos + 8 <= len(buf):
+        chunk_id = buf[pos:pos + 4]
+        size = int.from_bytes(buf[pos + 4:pos + 8], "little")
+        body = pos + 8
+        if chunk_id == b"fmt ":
+            if size < 16 or body + 16 > len(buf):
+                return None
+            audio_format, channels, sr = struct.unpack_from("<HHI", buf, body)
+            (bits,) = struct.unpack_from("<H", buf, body + 14)
+            fmt = (audio_format, channels, sr, bits)
+        elif chunk_id == b"data":
+            if fmt is None:
+                return None
+            audio_format, channels, sr, bits = fmt
+            if audio_format != 1 or bits != 16 or channels < 1:
+                return None
+            # Streaming writers may leave the size unset; clamp to the buffer.
+            size = min(size, len(buf) - body)
+            frames = size // (2 * channels)
+            pcm16 = np.frombuffer(buf, dtype="<i2",
+                                  count=frames * channels, offset=body)
+            audio = pcm16.astype(np.float32)
+            audio *= 1.0 / 32768.0
+            if channels > 1:
+                audio = audio.reshape(-1, channels)
+            return audio, int(sr)
+        pos = body + size + (size & 1)
+
+    return None
+
+
+def _resample(audio: np.ndarray, source_sr: int, target_sr: int) -> np.ndarray:
+    """Band-limited polyphase resample; the FIR low-pass prevents aliasing."""
+    if source_sr == target_sr or len(audio) == 0:
+        return audio
+    g = gcd(source_sr, target_sr)
+    out = scipy_signal.resample_poly(
+        audio, target_sr // g, source_sr // g, window=("kaiser", 8.0))
+    return out.astype(np.float32, copy=False)
+
 
 @dataclass(frozen=True)
 class AsrConfig:
     model_id: str = "openai/whisper-large-v3"
     device: str | int = "cpu"  # set to 0 for CUDA:0
+    # "fp16"/"bf16" halve weight bandwidth on GPU; ignored on CPU.
     torch_dtype: str | None = None
+    # "transformers" (HF pipeline) or "faster-whisper" (CTranslate2, int8).
+    backend: str = "transformers"
+    # faster-whisper only; defaults to int8_float16 on CUDA and int8 on CPU.
+    compute_type: str | None = None
+    # None lets Whisper detect the language per request.
+    language: str | None = None
+    # Run one dummy transcription at load so the first request is not cold.
+    warmup: bool = True
 
 
 class AsrService:
     def __init__(self, cfg: AsrConfig):
-        # HF pipeline is synchronous; we'll call it from a thread in the API layer.
-        self._pipe = pipeline(
-            task="automatic-speech-recognition",
-            model=cfg.model_id,
-            device=cfg.device,
-        )
+        self._cfg = cfg
+        self._pipe = None
+        self._model = None
+        # Long inputs are split into 30 s chunks; on GPU decode up to 16 of them
+        # in parallel instead of one after another.
+        self._chunk_batch_size = 16 if isinstance(cfg.device, int) else 1
+        if cfg.backend == "faster-whisper":
+            from faster_whisper import WhisperModel
+
+            on_gpu = isinstance(cfg.device, int)
+            self._model = WhisperModel(
+                cfg.model_id,
+                device="cuda" if on_gpu else "cpu",
+                device_index=cfg.device if on_gpu else 0,
+                compute_type=cfg.compute_type or (
+                    "int8_float16" if on_gpu else "int8"),
+            )
+        elif cfg.backend == "transformers":
+            # Validate the name even on CPU, where it is ignored.
+            torch_dtype = _torch_dtype(cfg.torch_dtype) if cfg.torch_dtype else None
+            if not isinstance(cfg.device, int):
+                torch_dtype = None
+            # HF pipeline is synchronous; we'll call it from a thread in the API layer.
+            self._pipe = pipeline(
+                task="automatic-speech-recognition",
+                model=cfg.model_id,
+                device=cfg.device,
+                torch_dtype=torch_dtype,
+            )
+        else:
+            raise ValueError(f"Unknown ASR backend: {cfg.backend}")
+
+        if cfg.warmup:
+            silence = np.zeros(16000, dtype=np.float32)
+            if self._model is not None:
+                # The VAD would drop pure silence before the decoder ever ran.
+                self._transcribe_ct2(silence, 16000, vad_filter=False)
+            else:
+                self.transcribe_batch([(silence, 16000)])
 
     def transcribe_wav_b64(self, audio_b64: str) -> str:
-        wav_bytes = base64.b64decode(audio_b64)
-        audio, sr = self._decode_audio(wav_bytes)
-        out = self._pipe({"array": audio, "sampling_rate": sr},
-                         chunk_length_s=30, ignore_warning=True)
-        text = out.get("text", "") if isinstance(out, dict) else str(out)
-        return text.strip()
+        return self.transcribe_batch([self.decode_wav_b64(audio_b64)])[0]
+
+    def decode_wav_b64(self, audio_b64: str) -> tuple[np.ndarray, int]:
+        return self.decode_wav(pybase64.b64decode(audio_b64))
+
+    def decode_wav(self, wav_bytes: bytes) -> tuple[np.ndarray, int]:
+        return self._decode_audio(wav_bytes)
+
+    def transcribe_batch(self, items: list[tuple[np.ndarray, int]]) -> list[str]:
+        if self._model is not None:
+            return [self._transcribe_ct2(audio, sr) for audio, sr in items]
+
+        # One pipeline call for all items so the model runs them as a single batch.
+        inputs = [{"array": audio, "sampling_rate": sr} for audio, sr in items]
+        outs = self._pipe(inputs, chunk_length_s=30,
+                          batch_size=max(len(inputs), self._chunk_batch_size),
+                          return_timestamps=False, ignore_warning=True)
+        texts = []
+        for out in outs:
+            text = out.get("text", "") if isinstance(out, dict) else str(out)
+            texts.append(text.strip())
+        return texts
+
+    def _transcribe_ct2(self, audio: np.ndarray, sr: int,
+                        vad_filter: bool = True) -> str:
+        # faster-whisper expects 16 kHz mono float32 arrays.
+        audio = _resample(audio, sr, 16000)
+        segments, _ = self._model.transcribe(
+            audio, language=self._cfg.language, beam_size=1, vad_filter=vad_filter)
+        return "".join(segment.text for segment in segments).strip()
 
     @staticmethod
     def _decode_audio(wav_bytes: bytes) -> tuple[np.ndarray, int]:
-        with sf.SoundFile(io.BytesIO(wav_bytes)) as f:
-            sr = int(f.samplerate)
-            audio = f.read(dtype="float32")
+        decoded = _read_pcm16_wav(wav_bytes)
+        if decoded is not None:
+            audio, sr = decoded
+        else:
+            with sf.SoundFile(io.BytesIO(wav_bytes)) as f:
+                sr = int(f.samplerate)
+                audio = f.read(dtype="float32")
 
         # Convert stereo -> mono if needed.
         if audio.ndim == 2:
             audio = np.mean(audio, axis=1)
 
         return audio, sr
+
+
+class UtteranceBuffer:
+    """Accumulates streamed PCM16LE and ends an utterance after trailing silence.
+
+    Speech is detected with a per-frame RMS threshold; leading silence is not
+    kept beyond the latest frame so idle streams do not grow the buffer. An
+    utterance is also ended once it reaches ``max_ms``, which bounds the cost of
+    re-transcribing it for every partial.
+    """
+
+    def __init__(self, sample_rate: int, silence_ms: int, vad_rms: float,
+                 max_ms: int = 30000):
+        self.sample_rate = sample_rate
+        self._silence_samples = int(sample_rate * silence_ms / 1000)
+        self._max_samples = int(sample_rate * max_ms / 1000)
+        self._vad_rms = vad_rms
+        self._carry = b""
+        self.reset()
+
+    def reset(self) -> None:
+        self._frames: list[np.ndarray] = []
+        self.num_samples = 0
+        self.has_speech = False
+        self._trailing_silence = 0
+
+    def append(self, pcm: bytes) -> bool:
+        """Add PCM bytes; return True once speech is followed by enough silence
+        or the utterance has reached its maximum length."""
+        pcm = self._carry + pcm
+        usable = len(pcm) - (len(pcm) % 2)
+        self._carry = pcm[usable:]
+        if usable == 0:
+            return False
+
+        frame = np.frombuffer(pcm, dtype="<i2", count=usable // 2).astype(np.float32)
+        frame *= 1.0 / 32768.0
+        speech = float(np.sqrt(np.mean(frame * frame))) >= self._vad_rms
+
+        if not self.has_speech and not speech:
+            self._frames = [frame]
+            self.num_samples = len(frame)
+            return False
+
+        self._frames.append(frame)
+        self.num_samples += len(frame)
+        if speech:
+            self.has_speech = True
+            self._trailing_silence = 0
+        else:
+            self._trailing_silence += len(frame)
+        return (self._trailing_silence >= self._silence_samples
+                or self.num_samples >= self._max_samples)
+
+    def audio(self) -> np.ndarray:
+        if len(self._frames) > 1:
+            self._frames = [np.concatenate(self._frames)]
+        return self._frames[0] if self._frames else np.zeros(0, dtype=np.float32)
@@ -1,22 +1,20 @@
 from __future__ import annotations
 
 import asyncio
-import base64
-import io
 import logging
 import os
 import re
 import time
-from typing import Iterable, Tuple
+from typing import Iterable
 
 import numpy as np
-import soundfile as sf
+import pybase64
 from dotenv import find_dotenv, load_dotenv
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel, Field
-from scipy import signal as scipy_signal
 
-from .service import TtsConfig, TtsService
+from .service import TtsConfig, TtsService, peak_gain
 
 load_dotenv(find_dotenv())
 
@@ -27,13 +25,21 @@ logging.basicConfig(level=logging.INFO,
 app = FastAPI(title="TTS Worker", version="1.0.0")
 _service: TtsService | None = None
 
-_SYNTH_SEMAPHORE = asyncio.Semaphore(1)
+# Bounds synthesis threads across all requests. TtsService runs the model one
+# call at a time; a second slot lets one chunk's resample/PCM conversion overlap
+# the next chunk's model call.
+_SYNTH_SEMAPHORE = asyncio.Semaphore(
+    max(1, int(os.getenv("TTS_MAX_CONCURRENCY", "2"))))
 
 TARGET_SAMPLE_RATE = 24000
 TARGET_CHANNELS = 1
 MAX_TEXT_LENGTH = 4000
 MAX_TTS_CHUNK_CHARS = 500
 
+_MD_EMPHASIS_RE = re.compile(r"\*{1,3}([^*]+)\*{1,3}")
+_MD_CHARS_TABLE = str.maketrans("", "", "`_~")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+
 
 class TtsRequest(BaseModel):
     text: str = Field(..., description="Input text to synthesize")
@@ -46,7 +52,7 @@ class TtsResponse(BaseModel):
 
 
 def _get_service() -> TtsService:
-    """Lazy load the TTS service on first use."""
+    """Load the TTS service once per process (done eagerly at startup)."""
     global _service
     if _service is None:
         _service = TtsService(
@@ -54,38 +60,34 @@ def _get_service() -> TtsService:
                 model_name=os.getenv(
                     "TTS_MODEL_NAME",
                     "tts_models/multilingual/multi-dataset/xtts_v2",
-                )
+                ),
+                device=os.getenv("TTS_DEVICE", "cpu"),
+                dtype=os.getenv("TTS_DTYPE") or None,
+                warmup=os.getenv("TTS_WARMUP", "1") != "0",
             )
         )
     return _service
 
 
-def _decode_wav_to_pcm16(wav_b64: str) -> Tuple[bytes, int, int]:
-    """Decode WAV base64 to PCM16LE bytes with enforced 24kHz mono."""
-    wav_bytes = base64.b64decode(wav_b64)
-    audio, sr = sf.read(io.BytesIO(wav_bytes), dtype="float32")
-
-    if audio.ndim > 1:
-        audio = np.mean(audio, axis=1)
-
-    if sr != TARGET_SAMPLE_RATE:
-        num_samples = int(len(audio) * TARGET_SAMPLE_RATE / sr)
-        audio = scipy_signal.resample(audio, num_samples)
-        sr = TARGET_SAMPLE_RATE
-
-    audio = np.clip(audio, -1.0, 1.0)
-    pcm16 = (audio * 32767.0).astype(np.int16)
-    return pcm16.tobytes(), sr, TARGET_CHANNELS
+def _float_to_pcm16(audio: np.ndarray, gain: float = 1.0) -> bytes:
+    """Scale float audio by ``gain`` and convert to PCM16LE bytes in place."""
+    audio = np.asarray(audio, dtype=np.float32)
+    if not audio.flags.writeable:
+        audio = audio.copy()
+    if gain != 1.0:
+        np.multiply(audio, gain, out=audio)
+    np.clip(audio, -1.0, 1.0, out=audio)
+    np.multiply(audio, 32767.0, out=audio)
+    return audio.astype(np.int16).tobytes()
 
 
 def _sanitize_tts_text(text: str) -> str:
     """Remove markdown and TTS-hostile characters while preserving meaning."""
-    cleaned = text
-    cleaned = re.sub(r"\*{1,3}([^*]+)\*{1,3}", r"\1", cleaned)
-    cleaned = re.sub(r"[`_~]", "", cleaned)
-    cleaned = re.sub(r"\s*\n+\s*", " ", cleaned)
-    cleaned = re.sub(r"\s+", " ", cleaned)
-    return cleaned.strip()
+    # Only the emphasis markers need a regex; the rest are single C-level passes.
+    cleaned = _MD_EMPHASIS_RE.sub(r"\1", text)
+    cleaned = cleaned.translate(_MD_CHARS_TABLE)
+    # Collapses every whitespace run (newlines included) and trims the ends.
+    return " ".join(cleaned.split())
 
 
 def _split_text_for_tts(text: str, max_chars: int) -> Iterable[str]:
@@ -94,7 +96,7 @@ def _split_text_for_tts(text: str, max_chars: int) -> Iterable[str]:
     if len(cleaned) <= max_chars:
         return [cleaned]
 
-    sentences = re.split(r"(?<=[.!?])\s+", cleaned)
+    sentences = _SENTENCE_END_RE.split(cleaned)
     chunks: list[str] = []
     current = ""
 
@@ -102,12 +104,20 @@ def _split_text_for_tts(text: str, max_chars: int) -> Iterable[str]:
         if not sentence:
             continue
         if len(sentence) > max_chars:
-            # Hard split very long sentence.
-            for i in range(0, len(sentence), max_chars):
-                part = sentence[i:i + max_chars].strip()
-                if part:
-                    chunks.append(part)
-            current = ""
+            if current:
+                chunks.append(current)
+                current = ""
+            # Pack the long sentence word by word; only a single word longer
+            # than max_chars is cut mid-word.
+            for word in sentence.split():
+                for i in range(0, len(word), max_chars):
+                    piece = word[i:i + max_chars]
+                    if current and len(current) + 1 + len(piece) <= max_chars:
+                        current = f"{current} {piece}"
+                    else:
+                        if current:
+                            chunks.append(current)
+                        current = piece
             continue
 
         if not current:
@@ -126,42 +136,166 @@ def _split_text_for_tts(text: str, max_chars: int) -> Iterable[str]:
     return chunks
 
 
-@app.get("/healthz")
-async def healthz():
-    return {"ok": True}
-
-
-@app.post("/v1/tts", response_model=TtsResponse)
-async def tts(req: TtsRequest):
-    text = req.text.strip()
+def _validate_text(raw: str) -> str:
+    text = raw.strip()
     if not text:
         raise HTTPException(status_code=400, detail="text must not be empty")
     if len(text) > MAX_TEXT_LENGTH:
         raise HTTPException(
             status_code=413, detail="text exceeds maximum length")
+    return text
+
+
+def _synthesize_unnormalized(service: TtsService, chunk: str) -> np.ndarray:
+    # Chunks are normalized together by the caller so loudness does not jump
+    # at chunk boundaries.
+    audio, _ = service.synthesize(chunk, normalize=False)
+    return audio
+
+
+def _join_to_pcm16(parts: list[np.ndarray]) -> bytes:
+    audio = np.concatenate(parts) if len(parts) > 1 else parts[0]
+    return _float_to_pcm16(audio, peak_gain(audio))
 
+
+async def _synthesize_chunk(service: TtsService, chunk: str) -> np.ndarray:
     async with _SYNTH_SEMAPHORE:
-        service = _get_service()
-        start = time.perf_counter()
-
-        cleaned = _sanitize_tts_text(text)
-        wav_b64, _ = await asyncio.to_thread(service.synthesize_wav_b64, cleaned)
-        pcm_bytes, sr, channels = _decode_wav_to_pcm16(wav_b64)
-        elapsed_ms = int((time.perf_counter() - start) * 1000)
-
-        logger.info(
-            "synth_complete",
-            extra={
-                "text_length": len(text),
-                "chunks": 1,
-                "duration_ms": elapsed_ms,
-                "pcm_bytes": len(pcm_bytes),
-                "sample_rate": sr,
-            },
-        )
+        work = asyncio.ensure_future(
+            asyncio.to_thread(_synthesize_unnormalized, service, chunk))
+        try:
+            return await asyncio.shield(work)
+        except asyncio.CancelledError:
+            # The thread cannot be interrupted; keep the slot until it exits so
+            # the concurrency bound still holds after a cancel.
+            await asyncio.wait({work})
+            if not work.cancelled():
+                work.exception()  # Mark a thread error as retrieved.
+            raise
 
-        return TtsResponse(
-            audio_pcm_b64=base64.b64encode(pcm_bytes).decode("ascii"),
-            sample_rate=sr,
-            channels=channels,
-        )
+
+def _start_synthesis(text: str) -> list[asyncio.Task[np.ndarray]]:
+    """Schedule every sentence chunk at once; results stay in text order."""
+    service = _get_service()
+    return [
+        asyncio.create_task(_synthesize_chunk(service, chunk))
+        for chunk in _split_text_for_tts(text, MAX_TTS_CHUNK_CHARS)
+    ]
+
+
+def _log_abandoned(task: asyncio.Task[np.ndarray]) -> None:
+    # Retrieve the exception so asyncio doesn't report it as never retrieved.
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("abandoned TTS chunk failed", exc_info=task.exception())
+
+
+def _cancel(tasks: list[asyncio.Task[np.ndarray]]) -> None:
+    """Cancel tasks whose results nobody will await, logging any failures."""
+    for task in tasks:
+        task.cancel()
+        task.add_done_callback(_log_abandoned)
+
+
+@app.on_event("startup")
+async def _load_service():
+    # Load and warm the model before serving so no request pays for it.
+    await asyncio.to_thread(_get_service)
+
+
+@app.get("/healthz")
+async def healthz():
+    return {"ok": True}
+
+
+async def _synthesize_text(text: str) -> bytes:
+    start = time.perf_counter()
+
+    tasks = _start_synthesis(text)
+    try:
+        parts = await asyncio.gather(*tasks)
+    except BaseException:
+        # gather already retrieved the failures of finished tasks.
+        _cancel([task for task in tasks if not task.done()])
+        raise
+    pcm_bytes = await asyncio.to_thread(_join_to_pcm16, parts)
+    elapsed_ms = int((time.perf_counter() - start) * 1000)
+
+    logger.info(
+        "synth_complete",
+        extra={
+            "text_length": len(text),
+            "chunks": len(tasks),
+            "duration_ms": elapsed_ms,
+            "pcm_bytes": len(pcm_bytes),
+            "sample_rate": TARGET_SAMPLE_RATE,
+        },
+    )
+    return pcm_bytes
+
+
+def _pcm_headers() -> dict[str, str]:
+    return {
+        "X-Sample-Rate": str(TARGET_SAMPLE_RATE),
+        "X-Channels": str(TARGET_CHANNELS),
+    }
+
+
+@app.post("/v1/tts", response_model=TtsResponse)
+async def tts(req: TtsRequest):
+    pcm_bytes = await _synthesize_text(_validate_text(req.text))
+    # Multi-MB responses; keep the encode off the event loop.
+    audio_pcm_b64 = await asyncio.to_thread(pybase64.b64encode, pcm_bytes)
+    return TtsResponse(
+        audio_pcm_b64=audio_pcm_b64.decode("ascii"),
+        sample_rate=TARGET_SAMPLE_RATE,
+        channels=TARGET_CHANNELS,
+    )
+
+
+@app.post("/v1/tts/pcm")
+async def tts_pcm(req: TtsRequest):
+    """Same as /v1/tts but returns raw PCM16LE bytes instead of base64 JSON."""
+    pcm_bytes = await _synthesize_text(_validate_text(req.text))
+    return Response(content=pcm_bytes,
+                    media_type="application/octet-stream",
+                    headers=_pcm_headers())
+
+
+@app.post("/v1/tts/stream")
+async def tts_stream(req: TtsRequest):
+    """Stream raw PCM16LE per chunk as soon as each one is ready, in order.
+
+    The response peak is unknown when the first chunk goes out, so streamed
+    audio is not peak-normalized; it keeps the model's own level throughout.
+
+    Headers are sent before synthesis finishes, so a chunk failure cannot
+    change the status code: it is logged and the connection is aborted without
+    the terminating zero-length chunk, so clients see an incomplete body
+    (e.g. curl exit 18, ``httpx.RemoteProtocolError``) rather than a clean,
+    silently truncated 200.
+    """
+    text = _validate_text(req.text)
+    tasks = _start_synthesis(text)
+
+    async def _pcm_chunks():
+        pending = list(tasks)
+        try:
+            while pending:
+                task = pending.pop(0)
+                try:
+                    audio = await task
+                except Exception:
+                    logger.exception(
+                        "TTS stream aborted at chunk %d of %d",
+                        len(tasks) - len(pending),
+                        len(tasks),
+                    )
+                    raise
+                yield _float_to_pcm16(audio)
+        finally:
+            _cancel(pending)
+
+    return StreamingResponse(
+        _pcm_chunks(),
+        media_type="application/octet-stream",
+        headers=_pcm_headers(),
+    )
@@ -1,15 +1,22 @@
 from __future__ import annotations
 
-import base64
-import io
+import contextlib
+import logging
 import os
+import threading
 from dataclasses import dataclass
+from math import gcd
 
 import numpy as np
-import soundfile as sf
 from scipy import signal as scipy_signal
 from TTS.api import TTS
 
+try:
+    # libsoxr is a C band-limited resampler; much faster than scipy on CPU.
+    import soxr
+except ImportError:
+    soxr = None
+
 try:
     # PyTorch 2.6+ defaults to weights_only=True and blocks some globals.
     # Allowlist XTTS config so torch.load can deserialize the checkpoint.
@@ -41,17 +48,82 @@ except Exception:
     pass
 
 
+def resample_audio(audio: np.ndarray, source_sr: int, target_sr: int) -> np.ndarray:
+    """Resample mono audio, preferring libsoxr over a polyphase FIR filter.
+
+    FFT-based resampling cost depends on the factorization of the signal length,
+    so odd-length utterances can be many times slower; both paths here are
+    O(N * taps) regardless of length.
+    """
+    if source_sr == target_sr:
+        return audio
+    if soxr is not None:
+        return soxr.resample(audio, source_sr, target_sr, quality="HQ")
+    g = gcd(source_sr, target_sr)
+    return scipy_signal.resample_poly(
+        audio, target_sr // g, source_sr // g, window=("kaiser", 8.0))
+
+
+logger = logging.getLogger("tts_service")
+
+PEAK_LEVEL = 0.95  # Normalize to 95% of max to prevent clipping
+
+
+def peak_gain(audio: np.ndarray) -> float:
+    """Gain that scales the peak of ``audio`` to PEAK_LEVEL (1.0 for silence)."""
+    # max/min instead of an abs() temporary.
+    peak = max(float(audio.max(initial=0.0)), -float(audio.min(initial=0.0)))
+    return PEAK_LEVEL / peak if peak > 0 else 1.0
+
+
+# Same spellings the ASR worker accepts for ASR_TORCH_DTYPE.
+_DTYPE_NAMES = {
+    "fp16": "float16",
+    "float16": "float16",
+    "bf16": "bfloat16",
+    "bfloat16": "bfloat16",
+    "fp32": "float32",
+    "float32": "float32",
+}
+
+# XTTS language code for every request.
+_LANGUAGE = "en"
+
+# Silence Synthesizer.tts() appends after each segment (model sample rate).
+# The latent path calls the model directly and adds the same pad so chunked
+# replies keep their pause at chunk boundaries.
+_SEGMENT_PAD_SAMPLES = 10000
+
+_SAMPLING = {
+    "top_k": 250,  # Reduce randomness for consistency
+    "top_p": 0.85,  # Nucleus sampling for diversity
+    "temperature": 0.75,  # Slightly lower for clearer speech
+}
+
+
 @dataclass(frozen=True)
 class TtsConfig:
     # Coqui TTS model registry name for XTTS-v2
     # (This is the canonical runtime identifier used by the `TTS` library.)
     model_name: str = "tts_models/multilingual/multi-dataset/xtts_v2"
+    # Torch device for the model, e.g. "cpu" or "cuda:0".
+    device: str = "cpu"
+    # "fp16"/"bf16" run XTTS under CUDA autocast; "fp32" or None is full
+    # precision. Ignored on CPU.
+    dtype: str | None = None
+    # Run one short synthesis at load so the first request is not cold.
+    warmup: bool = True
 
 
 class TtsService:
     def __init__(self, cfg: TtsConfig):
+        # Resolve before loading so a typo fails fast.
+        self._autocast_dtype = self._resolve_autocast_dtype(cfg)
         # Loading is expensive; keep singleton per process.
-        self._tts = TTS(cfg.model_name)
+        self._tts = TTS(cfg.model_name).to(cfg.device)
+        # XTTS keeps per-call state on the module (e.g. the GPT's cached prefix
+        # embedding), so only one thread may run the model at a time.
+        self._model_lock = threading.Lock()
         self._default_speaker = (
             os.getenv("TTS_SPEAKER") or "").strip() or None
         if not self._default_speaker:
@@ -62,39 +134,130 @@ class TtsService:
             except Exception:
                 self._default_speaker = None
 
-    def synthesize_wav_b64(self, text: str) -> tuple[str, int]:
-        # Log text length for debugging
-        print(f"[TTS] Synthesizing text: {len(text)} characters")
-        print(f"[TTS] Text preview: {text[:100]}..." if len(
-            text) > 100 else f"[TTS] Full text: {text}")
+        # XTTS voice conditioning, computed once instead of on every request.
+        # TTS_SPEAKER_WAV is an optional path to a reference recording to clone;
+        # without it the built-in TTS_SPEAKER voice is used. None falls back to
+        # the high-level TTS.tts() path.
+        self._cond_latents = self._load_conditioning_latents(
+            (os.getenv("TTS_SPEAKER_WAV") or "").strip() or None)
 
-        # No truncation - synthesize the full text
-        # XTTS-v2 can handle long text, it just takes longer
+        if cfg.warmup:
+            # First inference pays kernel selection/JIT costs; pay them here.
+            self._infer("Warm up.")
+
+    @staticmethod
+    def _resolve_autocast_dtype(cfg: TtsConfig):
+        if not cfg.dtype:
+            return None
+        name = _DTYPE_NAMES.get(cfg.dtype.strip().lower())
+        if name is None:
+            raise ValueError(
+                f"Unknown TTS dtype {cfg.dtype!r}; "
+                f"expected one of {', '.join(_DTYPE_NAMES)}")
+        if name == "float32" or not cfg.device.startswith("cuda"):
+            return None
+        import torch
+
+        # Autocast rather than casting the weights: XTTS builds fp32 tensors
+        # internally (conditioning mels, latents), which a half-precision
+        # module rejects.
+        return getattr(torch, name)
+
+    def _load_conditioning_latents(self, speaker_wav: str | None):
+        model = getattr(self._tts.synthesizer, "tts_model", None)
+        if model is None or not hasattr(model, "get_conditioning_latents"):
+            return None
+        try:
+            if speaker_wav:
+                latents = model.get_conditioning_latents(
+                    audio_path=[speaker_wav],
+                    gpt_cond_len=model.config.gpt_cond_len,
+                    gpt_cond_chunk_len=model.config.gpt_cond_chunk_len,
+                    max_ref_length=model.config.max_ref_len,
+                    sound_norm_refs=model.config.sound_norm_refs,
+                )
+            elif self._default_speaker:
+                entry = model.speaker_manager.speakers[self._default_speaker]
+                latents = (entry["gpt_cond_latent"], entry["speaker_embedding"])
+            else:
+                return None
+            param = next(model.parameters())
+            return tuple(t.to(device=param.device, dtype=param.dtype) for t in latents)
+        except Exception:
+            logger.warning("Speaker latents unavailable; using TTS.tts()",
+                           exc_info=True)
+            return None
+
+    def _precision(self):
+        if self._autocast_dtype is None:
+            return contextlib.nullcontext()
+        import torch
+
+        return torch.autocast("cuda", dtype=self._autocast_dtype)
+
+    def _infer(self, text: str):
+        # No inference_mode() here: XTTS's inference() and synthesize() paths
+        # are already decorated with it.
+        with self._model_lock, self._precision():
+            return self._generate(text)
 
+    def _generate(self, text: str):
+        if self._cond_latents is None:
+            return self._tts.tts(text, **self._synth_kwargs())
+        gpt_cond_latent, speaker_embedding = self._cond_latents
+        model = self._tts.synthesizer.tts_model
+        # TTS.tts() fills the penalties from the model config; match it here.
+        out = model.inference(
+            text,
+            _LANGUAGE,
+            gpt_cond_latent,
+            speaker_embedding,
+            temperature=_SAMPLING["temperature"],
+            top_k=_SAMPLING["top_k"],
+            top_p=_SAMPLING["top_p"],
+            repetition_penalty=model.config.repetition_penalty,
+            length_penalty=model.config.length_penalty,
+            enable_text_splitting=False,
+        )
+        wav = np.asarray(out["wav"], dtype=np.float32).reshape(-1)
+        return np.concatenate([wav, np.zeros(_SEGMENT_PAD_SAMPLES, dtype=np.float32)])
+
+    def _synth_kwargs(self) -> dict:
         kwargs = {}
         if self._default_speaker:
             kwargs["speaker"] = self._default_speaker
 
         # Add quality settings for more natural voice
-        kwargs["language_idx"] = "en"  # Explicit English for better quality
+        kwargs["language_idx"] = _LANGUAGE
         # Use longer conditioning for quality
         kwargs["use_gpt_cond_len"] = True
         # Avoid internal sentence splitting to keep short responses contiguous
         kwargs["split_sentences"] = False
-        kwargs["top_k"] = 250  # Reduce randomness for consistency
-        kwargs["top_p"] = 0.85  # Nucleus sampling for diversity
-        kwargs["temperature"] = 0.75  # Slightly lower for clearer speech
+        kwargs.update(_SAMPLING)
+        return kwargs
+
+    def synthesize(self, text: str, normalize: bool = True) -> tuple[np.ndarray, int]:
+        """Return mono float32 audio resampled to 24 kHz, plus its sample rate.
 
-        wav = self._tts.tts(text, **kwargs)
-        if isinstance(wav, list):
-            wav = np.array(wav, dtype=np.float32)
-        elif not isinstance(wav, np.ndarray):
-            wav = np.array(wav, dtype=np.float32)
+        Pass ``normalize=False`` when the caller joins several calls and applies
+        one gain across all of them.
+        """
+        logger.debug("Synthesizing %d characters: %.100s", len(text), text)
 
-        # Normalize audio to prevent clipping and improve quality
-        max_val = np.max(np.abs(wav))
-        if max_val > 0:
-            wav = wav / max_val * 0.95  # Normalize to 95% of max to prevent clipping
+        # No truncation - synthesize the full text
+        # XTTS-v2 can handle long text, it just takes longer
+
+        wav = self._infer(text)
+        if hasattr(wav, "cpu"):  # torch tensor
+            wav = wav.float().cpu().numpy()
+        wav = np.asarray(wav, dtype=np.float32)
+
+        # Normalize audio to prevent clipping and improve quality.
+        # Done in place; wav is our own buffer.
+        if normalize:
+            if not wav.flags.writeable:
+                wav = wav.copy()
+            wav *= peak_gain(wav)
 
         # XTTS-v2 outputs at 22050 Hz, but we need 24000 Hz for consistency with Flutter
         source_sr = int(getattr(self._tts.synthesizer,
@@ -103,15 +266,8 @@ class TtsService:
 
         # Resample if needed
         if source_sr != target_sr:
-            print(
-                f"[TTS] Resampling audio from {source_sr}Hz to {target_sr}Hz")
-            # Calculate resampling ratio
-            num_samples = int(len(wav) * target_sr / source_sr)
-            wav = scipy_signal.resample(wav, num_samples)
-            print(f"[TTS] Resampled: {len(wav)} samples at {target_sr}Hz")
-
-        bio = io.BytesIO()
-        sf.write(bio, wav, target_sr, format="WAV")
-        audio_b64 = base64.b64encode(bio.getvalue()).decode("ascii")
-        print(f"[TTS] Generated {len(audio_b64)} base64 bytes")
-        return audio_b64, target_sr
+            wav = resample_audio(wav, source_sr, target_sr)
+            logger.debug("Resampled %dHz -> %dHz: %d samples",
+                         source_sr, target_sr, len(wav))
+
+        return np.asarray(wav, dtype=np.float32), target_sr